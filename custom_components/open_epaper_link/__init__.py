@@ -3,7 +3,7 @@ from .imagegen import *
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.core import HomeAssistant
 from . import hub
-from .const import DOMAIN
+from .const import AP_IP_ENTITY, DOMAIN
 from datetime import datetime
 import logging
 import pprint
@@ -28,7 +28,7 @@ def rgb_to_rgb332(rgb):
 def setup(hass, config):
     # callback for the draw custom service
     async def drawcustomservice(service: ServiceCall) -> None:
-        ip = hass.states.get(DOMAIN + ".ip").state 
+        ip = hass.states.get(AP_IP_ENTITY).state 
         entity_ids = service.data.get("entity_id")
         #sometimes you get a string, that's not nice to iterate over for ids....
         if isinstance(entity_ids, str):
@@ -51,7 +51,7 @@ def setup(hass, config):
                 
     # callback for the image downlaod service
     async def dlimg(service: ServiceCall) -> None:
-        ip = hass.states.get(DOMAIN + ".ip").state 
+        ip = hass.states.get(AP_IP_ENTITY).state 
         entity_ids = service.data.get("entity_id")
         dither = service.data.get("dither", False)
         for entity_id in entity_ids:
@@ -62,7 +62,7 @@ def setup(hass, config):
 
     # callback for the 5 line service(depricated)
     async def lines5service(service: ServiceCall) -> None:
-        ip = hass.states.get(DOMAIN + ".ip").state
+        ip = hass.states.get(AP_IP_ENTITY).state
         entity_ids = service.data.get("entity_id")
         for entity_id in entity_ids:
             _LOGGER.info("Called entity_id: %s" % (entity_id))
@@ -72,7 +72,7 @@ def setup(hass, config):
 
     # callback for the 4 line service(depricated)
     async def lines4service(service: ServiceCall) -> None:
-        ip = hass.states.get(DOMAIN + ".ip").state
+        ip = hass.states.get(AP_IP_ENTITY).state
         entity_ids = service.data.get("entity_id")
         for entity_id in entity_ids:
             _LOGGER.info("Called entity_id: %s" % (entity_id))
@@ -82,7 +82,7 @@ def setup(hass, config):
             
     # callback for the setled service
     async def setled(service: ServiceCall) -> None:
-        ip = hass.states.get(DOMAIN + ".ip").state
+        ip = hass.states.get(AP_IP_ENTITY).state
         entity_ids = service.data.get("entity_id")
         for entity_id in entity_ids:
             _LOGGER.info("Called entity_id: %s" % (entity_id))
@@ -133,6 +133,6 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     unload_ok = await hass.config_entries.async_unload_platforms(entry, ["sensor"])
     if unload_ok:
-        hass.data[DOMAIN].pop(entry.entry_id)
+        await hass.data[DOMAIN].pop(entry.entry_id).async_stop()
     return unload_ok
 
@@ -19,6 +19,8 @@ async def validate_input(hass: HomeAssistant, data: dict) -> dict[str, Any]:
         raise InvalidHost
     hub = Hub(hass, data["host"], "")
     result = await hub.test_connection()
+    #the hub is only needed for the check, stop its websocket task again
+    await hub.async_stop()
     if not result:
         raise CannotConnect
     return {"title": data["host"]}
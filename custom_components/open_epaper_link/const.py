@@ -1 +1,20 @@
 DOMAIN = "open_epaper_link"
+
+#event fired on every tag check-in, carries the wakeup reason
+EVENT_TAG = f"{DOMAIN}_event"
+
+#entity holding the AP address, read by the services to reach the AP
+AP_IP_ENTITY = f"{DOMAIN}.ip"
+
+#wakeup reason codes reported by the tags, the names are used as device trigger types
+WAKEUP_REASONS = {
+    0: "TIMED",
+    1: "BOOT",
+    2: "GPIO",
+    3: "NFC",
+    4: "BUTTON1",
+    5: "BUTTON2",
+    252: "FIRSTBOOT",
+    253: "NETWORK_SCAN",
+    254: "WDT_RESET",
+}
@@ -17,7 +17,7 @@ from homeassistant.helpers import config_validation as cv, entity_registry as er
 from homeassistant.helpers.trigger import TriggerActionType, TriggerInfo
 from homeassistant.helpers.typing import ConfigType
 from homeassistant.helpers import device_registry as dr
-from .const import DOMAIN
+from .const import DOMAIN, EVENT_TAG
 _LOGGER: Final = logging.getLogger(__name__)
 
 TRIGGER_TYPES = {"GPIO", "NFC", "BUTTON1", "BUTTON2"}
@@ -73,7 +73,7 @@ async def async_attach_trigger(hass, config, action, trigger_info):
     event_config = event_trigger.TRIGGER_SCHEMA(
         {
             event_trigger.CONF_PLATFORM: "event",
-            event_trigger.CONF_EVENT_TYPE: "open_epaper_link_event",
+            event_trigger.CONF_EVENT_TYPE: EVENT_TAG,
             event_trigger.CONF_EVENT_DATA: {
                 CONF_DEVICE_ID: config[CONF_DEVICE_ID],
                 CONF_TYPE: config[CONF_TYPE],
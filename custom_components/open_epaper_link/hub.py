@@ -1,239 +1,287 @@
 from __future__ import annotations
 import asyncio
 import random
-import websocket
 import socket
 import aiohttp
 import async_timeout
 import backoff
-import time
-import json
 import logging
 import os
-from threading import Thread
 from typing import Any
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers import device_registry as dr
-from .const import DOMAIN
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+from homeassistant.util.json import json_loads
+from .const import AP_IP_ENTITY, DOMAIN, EVENT_TAG, WAKEUP_REASONS
 
 _LOGGER: Final = logging.getLogger(__name__)
 
 # Time to wait before trying to reconnect on disconnections.
 _RECONNECT_SECONDS : int = 30
+# Upper bound for the reconnect delay, which doubles while the AP stays unreachable.
+_MAX_RECONNECT_SECONDS : int = 300
+# Time to wait for more new tags before reloading the platforms.
+_RELOAD_DELAY_SECONDS : int = 2
+
+#hardware type -> [name, width, height], required for automations
+_HWMAP = {
+    0: ["M2 1.54\"", 152, 152],
+    1: ["M2 2.9\"",  296, 128],
+    2: ["M2 4.2\"",  400, 300],
+    5: ["M2 7.4\"",  640, 384],
+    17: ["M2 2.9\" (NFC)", 296, 128],
+    18: ["M2 4.2\" (NFC)",  400, 300],
+    26: ["M2 7.4\" (outdated)",  640, 384],
+    33: ["M2 2.9\"", 296, 128],
+    38: ["M2 7.4 BW\"",  640, 384],
+    46: ["M3 9.7\"",  960, 672],
+    47: ["M3 4.3\"",  522, 152],
+    48: ["M3 1.6\"",  200, 200],
+    49: ["M3 2.2\"",  296, 160],
+    50: ["M3 2.6\"",  360, 184],
+    51: ["M3 2.9\"",  384, 168],
+    52: ["M3 4.2\"",  400, 300],
+    53: ["M3 6.0\"",  600, 448],
+    54: ["M3 7.5\"",  800, 480],
+    67: ["M3 1.3\" Peghook",  144, 200],
+    85: ["HS BWR 2.13\"",  256, 128],
+    86: ["HS BWR 2.66\"",  296, 152],
+    96: ["HS BWY 3.5\"",  384, 184],
+    97: ["HS BWR 3.5\"",  384, 184],
+    98: ["HS BW 3.5\"",  384, 184],
+    176: ["Gicisky BLE EPD BW 2.1\"",  212, 104],
+    177: ["Gicisky BLE EPD BWR 2.13\"",  250, 128],
+    178: ["Gicisky BLE EPD BW 2.9\"",  296, 128],
+    179: ["Gicisky BLE EPD BWR 2.9\"",  296, 128],
+    181: ["Gicisky BLE EPD BWR 4.2\"",  400, 300],
+    186: ["Gicisky BLE TFT 2.13\"",  250, 132],
+    191: ["Gicisky BLE Unknown",  0, 0],
+    190: ["ATC MiThermometer BLE",  6, 8],
+    224: ["AP display",  320, 170],
+    225: ["AP display",  160, 80],
+    240: ["Segmented",  0, 0]
+}
+
+#fields copied from a tag message into the hub data, as (key in hub data, key in message)
+_TAG_FIELDS = (
+    ("temperature", "temperature"),
+    ("rssi", "RSSI"),
+    ("battery", "batteryMv"),
+    ("lqi", "LQI"),
+    ("hwtype", "hwType"),
+    ("contentmode", "contentMode"),
+    ("lastseen", "lastseen"),
+    ("nextupdate", "nextupdate"),
+    ("nextcheckin", "nextcheckin"),
+    ("pending", "pending"),
+    ("wakeupReason", "wakeupReason"),
+    ("capabilities", "capabilities"),
+    ("external", "isexternal"),
+    ("alias", "alias"),
+    ("hashv", "hash"),
+    ("modecfgjson", "modecfgjson"),
+    ("rotate", "rotate"),
+    ("lut", "lut"),
+    ("ch", "ch"),
+    ("ver", "ver"),
+)
+
+#tag state attributes that are the same for every tag
+_TAG_STATE_ATTRS = {
+    "icon": "mdi:fullscreen",
+    "device_class": "sensor",
+    "should_poll": False,
+}
 
 #Hub class for handeling communication
 class Hub:
-    #the init function starts the thread for all other communication
+    #the init function starts the websocket task for all other communication
     def __init__(self, hass: HomeAssistant, host: str,cfgenty: str) -> None:
         self._host = host
+        self._ws_url = f"ws://{host}/ws"
         self._cfgenty = cfgenty
         self._hass = hass
         self._name = host
         self._id = host.lower()
         self.esls = []
-        self.data = dict()
-        self.data["ap"] = dict()
-        self.data["ap"]["ip"] =  self._host;
-        self.data["ap"]["systime"] = None;
-        self.data["ap"]["heap"] = None;
-        self.data["ap"]["recordcount"] = None;
-        self.data["ap"]["dbsize"] = None;
-        self.data["ap"]["littlefsfree"] = None;
+        #placeholder with the same keys _on_sys publishes, until the first status frame arrives
+        self.data = {
+            "ap": {
+                "ip": self._host,
+                "systime": None,
+                "heap": None,
+                "recordcount": None,
+                "dbsize": None,
+                "littlefsfree": None,
+                "rssi": None,
+                "apstate": None,
+                "runstate": None,
+                "temp": None,
+                "wifistatus": None,
+                "wifissid": None,
+            }
+        }
         self.eventloop = asyncio.get_event_loop()
-        thread = Thread(target=self.connection_thread)
-        thread.start()
+        self._reload_handle = None
+        self._ip_state_written = False
+        self._handlers = {
+            "sys": self._on_sys,
+            "tags": self._on_tags,
+        }
+        self._session = async_get_clientsession(hass)
+        self._ws_task = hass.async_create_background_task(self.connection_task(), f"{DOMAIN} websocket {host}")
         self.online = True
-    #parses websocket messages
-    def on_message(self,ws, message) -> None:
-        data =  json.loads('{' + message.split("{", 1)[-1])
-        if 'sys' in data:
-            sys = data.get('sys')
-            systime = sys.get('currtime')
-            heap = sys.get('heap')
-            recordcount = sys.get('recordcount')
-            dbsize = sys.get('dbsize')
-            littlefsfree = sys.get('littlefsfree')
-            apstate = sys.get('apstate')
-            runstate = sys.get('runstate')
-            temp = sys.get('temp')
-            rssi = sys.get('rssi')
-            wifistatus = sys.get('wifistatus')
-            wifissid = sys.get('wifissid')
-            self._hass.states.set(DOMAIN + ".ip", self._host,{"icon": "mdi:ip","friendly_name": "AP IP","should_poll": False})
-            self.data["ap"] = dict()
-            self.data["ap"]["ip"] =  self._host;
-            self.data["ap"]["systime"] = systime;
-            self.data["ap"]["heap"] = heap;
-            self.data["ap"]["recordcount"] = recordcount;
-            self.data["ap"]["dbsize"] = dbsize;
-            self.data["ap"]["littlefsfree"] = littlefsfree;
-            self.data["ap"]["rssi"] = rssi;
-            self.data["ap"]["apstate"] = apstate;
-            self.data["ap"]["runstate"] = runstate;
-            self.data["ap"]["temp"] = temp;
-            self.data["ap"]["wifistatus"] = wifistatus;
-            self.data["ap"]["wifissid"] = wifissid;
-        elif 'tags' in data:
-            tag = data.get('tags')[0]
-            tagmac = tag.get('mac')
-            lastseen = tag.get('lastseen')
-            nextupdate = tag.get('nextupdate')
-            nextcheckin = tag.get('nextcheckin')
-            LQI = tag.get('LQI')
-            RSSI = tag.get('RSSI')
-            temperature = tag.get('temperature')
-            batteryMv = tag.get('batteryMv')
-            pending = tag.get('pending')
-            hwType = tag.get('hwType')
-            contentMode = tag.get('contentMode')
-            alias = tag.get('alias')
-            wakeupReason = tag.get('wakeupReason')
-            capabilities = tag.get('capabilities')
-            hashv = tag.get('hash')
-            modecfgjson = tag.get('modecfgjson')
-            isexternal = tag.get('isexternal')
-            rotate = tag.get('rotate')
-            lut = tag.get('lut')
-            ch = tag.get('ch')
-            ver = tag.get('ver')
-            tagname = ""
-            if alias:
-                tagname = alias
-            else:
-                tagname = tagmac
-            #required for automations
-            hwmap = {
-                0: ["M2 1.54\"", 152, 152],
-                1: ["M2 2.9\"",  296, 128],
-                2: ["M2 4.2\"",  400, 300],
-                5: ["M2 7.4\"",  640, 384],
-                17: ["M2 2.9\" (NFC)", 296, 128],
-                18: ["M2 4.2\" (NFC)",  400, 300],
-                26: ["M2 7.4\" (outdated)",  640, 384],
-                33: ["M2 2.9\"", 296, 128],
-                38: ["M2 7.4 BW\"",  640, 384],
-                46: ["M3 9.7\"",  960, 672],
-                47: ["M3 4.3\"",  522, 152],
-                48: ["M3 1.6\"",  200, 200],
-                49: ["M3 2.2\"",  296, 160],
-                50: ["M3 2.6\"",  360, 184],
-                51: ["M3 2.9\"",  384, 168],
-                52: ["M3 4.2\"",  400, 300],
-                53: ["M3 6.0\"",  600, 448],
-                54: ["M3 7.5\"",  800, 480],
-                67: ["M3 1.3\" Peghook",  144, 200],
-                85: ["HS BWR 2.13\"",  256, 128],
-                86: ["HS BWR 2.66\"",  296, 152],
-                96: ["HS BWY 3.5\"",  384, 184],
-                97: ["HS BWR 3.5\"",  384, 184],
-                98: ["HS BW 3.5\"",  384, 184],
-                176: ["Gicisky BLE EPD BW 2.1\"",  212, 104],
-                177: ["Gicisky BLE EPD BWR 2.13\"",  250, 128],
-                178: ["Gicisky BLE EPD BW 2.9\"",  296, 128],
-                179: ["Gicisky BLE EPD BWR 2.9\"",  296, 128],
-                181: ["Gicisky BLE EPD BWR 4.2\"",  400, 300],
-                186: ["Gicisky BLE TFT 2.13\"",  250, 132],
-                191: ["Gicisky BLE Unknown",  0, 0],
-                190: ["ATC MiThermometer BLE",  6, 8],
-                224: ["AP display",  320, 170],
-                225: ["AP display",  160, 80],
-                240: ["Segmented",  0, 0]
-            }
-            if hwType in hwmap:
-                self._hass.states.set(DOMAIN + "." + tagmac, hwType,{
-                    "icon": "mdi:fullscreen",
+    #parses websocket messages, runs in the event loop
+    def on_message(self, message) -> None:
+        #only status and tag frames are used, log and other chatter is dropped before parsing
+        if '"sys"' not in message and '"tags"' not in message:
+            return
+        #frames may carry a prefix before the json object, slice it off without copying otherwise
+        start = message.find("{")
+        data = json_loads(message[start:] if start > 0 else message)
+        #AP messages carry a single top level key naming their type
+        for key, value in data.items():
+            handler = self._handlers.get(key)
+            if handler is not None:
+                handler(value)
+                return
+        _LOGGER.debug("Unknown msg")
+        _LOGGER.debug(data)
+    #AP status, sent periodically
+    def _on_sys(self, sys) -> None:
+        systime = sys.get('currtime')
+        heap = sys.get('heap')
+        recordcount = sys.get('recordcount')
+        dbsize = sys.get('dbsize')
+        littlefsfree = sys.get('littlefsfree')
+        apstate = sys.get('apstate')
+        runstate = sys.get('runstate')
+        temp = sys.get('temp')
+        rssi = sys.get('rssi')
+        wifistatus = sys.get('wifistatus')
+        wifissid = sys.get('wifissid')
+        #built as one literal and swapped in, readers never see a half filled dict
+        self.data["ap"] = {
+            "ip": self._host,
+            "systime": systime,
+            "heap": heap,
+            "recordcount": recordcount,
+            "dbsize": dbsize,
+            "littlefsfree": littlefsfree,
+            "rssi": rssi,
+            "apstate": apstate,
+            "runstate": runstate,
+            "temp": temp,
+            "wifistatus": wifistatus,
+            "wifissid": wifissid,
+        }
+        #the host never changes, so the AP IP state only needs to be written on the first status frame
+        if not self._ip_state_written:
+            self._hass.states.async_set(AP_IP_ENTITY, self._host,{"icon": "mdi:ip","friendly_name": "AP IP","should_poll": False})
+            self._ip_state_written = True
+    #tag check-in, the list always holds the one tag that reported
+    def _on_tags(self, tags) -> None:
+        tag = tags[0]
+        tagmac = tag.get('mac')
+        hwType = tag.get('hwType')
+        alias = tag.get('alias')
+        wakeupReason = tag.get('wakeupReason')
+        tagname = ""
+        if alias:
+            tagname = alias
+        else:
+            tagname = tagmac
+        hw = _HWMAP.get(hwType)
+        #the state only depends on hardware type and name, skip the write when neither changed
+        old = self.data.get(tagmac)
+        if old is None or old["hwtype"] != hwType or old["tagname"] != tagname:
+            if hw is not None:
+                self._hass.states.async_set(DOMAIN + "." + tagmac, hwType, _TAG_STATE_ATTRS | {
                     "friendly_name": tagname,
                     "attr_unique_id": tagmac,
                     "unique_id": tagmac,
-                    "device_class": "sensor",
                     "device_info": {
                     "identifiers": {(DOMAIN, tagmac)}
                     },
-                    "should_poll": False,
                     "hwtype": hwType,
-                    "hwstring": hwmap[hwType][0],
-                    "width": hwmap[hwType][1],
-                    "height": hwmap[hwType][2],
+                    "hwstring": hw[0],
+                    "width": hw[1],
+                    "height": hw[2],
                 })
             else:
                 _LOGGER.warning("Id not in hwmap, please open an issue on github about this." +str(hwType))
-                
-            self.data[tagmac] = dict()
-            self.data[tagmac]["temperature"] = temperature
-            self.data[tagmac]["rssi"] = RSSI
-            self.data[tagmac]["battery"] = batteryMv
-            self.data[tagmac]["lqi"] = LQI
-            self.data[tagmac]["hwtype"] = hwType
-            self.data[tagmac]["hwstring"] = hwmap[hwType][0]
-            self.data[tagmac]["contentmode"] = contentMode
-            self.data[tagmac]["lastseen"] = lastseen
-            self.data[tagmac]["nextupdate"] = nextupdate
-            self.data[tagmac]["nextcheckin"] = nextcheckin
-            self.data[tagmac]["pending"] = pending
-            self.data[tagmac]["wakeupReason"] = wakeupReason
-            self.data[tagmac]["capabilities"] = capabilities
-            self.data[tagmac]["external"] = isexternal
-            self.data[tagmac]["alias"] = alias
-            self.data[tagmac]["hashv"] = hashv
-            self.data[tagmac]["modecfgjson"] = modecfgjson
-            self.data[tagmac]["rotate"] = rotate
-            self.data[tagmac]["lut"] = lut
-            self.data[tagmac]["ch"] = ch
-            self.data[tagmac]["ver"] = ver
-            self.data[tagmac]["tagname"] = tagname
-            #maintains a list of all tags, new entities should be generated here
-            if tagmac not in self.esls:
-                self.esls.append(tagmac)
-                loop = self.eventloop
-                asyncio.run_coroutine_threadsafe(self.reloadcfgett(),loop)            
-            #fire event with the wakeup reason
-            lut = {0: "TIMED",1: "BOOT",2: "GPIO",3: "NFC",4: "BUTTON1",5: "BUTTON2",252: "FIRSTBOOT",253: "NETWORK_SCAN",254: "WDT_RESET"}
-            event_data = {
-                "device_id": tagmac,
-                "type": lut[wakeupReason],
-            }
-            self._hass.bus.fire(DOMAIN + "_event", event_data)
-        elif 'errMsg' in data:
-            ermsg = data.get('errMsg');
-        elif 'logMsg' in data:
-            logmsg = data.get('logMsg');
-        elif 'apitem' in data:
-            logmsg = data.get('apitem');
-        else:
-            _LOGGER.debug("Unknown msg")
-            _LOGGER.debug(data)
-    #log websocket errors
-    def on_error(self,ws, error) -> None:
-        _LOGGER.debug("Websocket error, most likely on_message crashed")
-        _LOGGER.debug(error)
-    def on_close(self, ws, close_status_code, close_msg) -> None:
-        _LOGGER.warning(
-            f"Websocket connection lost to url={ws.url} "
-            f"(close_status_code={close_status_code}, close_msg={close_msg}), "
-            f"trying to reconnect every {_RECONNECT_SECONDS} seconds")
-    #we could do something here
-    def on_open(self,ws) -> None:
-        _LOGGER.debug("WS started")
-
-    #starts the websocket
-    def connection_thread(self) -> None:
+            
+        #copied fields first, then the derived ones, published with a single assignment
+        get = tag.get
+        entry = {key: get(field) for key, field in _TAG_FIELDS}
+        entry["hwstring"] = hw[0] if hw is not None else None
+        entry["tagname"] = tagname
+        self.data[tagmac] = entry
+        #maintains a list of all tags, new entities should be generated here
+        if tagmac not in self.esls:
+            self.esls.append(tagmac)
+            #new tags tend to check in in bursts, reload once after the last one
+            if self._reload_handle is not None:
+                self._reload_handle.cancel()
+            self._reload_handle = self.eventloop.call_later(_RELOAD_DELAY_SECONDS, self._reload)
+        #fire event with the wakeup reason
+        event_data = {
+            "device_id": tagmac,
+            "type": WAKEUP_REASONS.get(wakeupReason, "UNKNOWN"),
+        }
+        self._hass.bus.async_fire(EVENT_TAG, event_data)
+    #keeps the websocket to the AP open, reconnecting whenever it drops
+    async def connection_task(self) -> None:
+        delay = _RECONNECT_SECONDS
         while True:
             try:
-                ws_url = "ws://" + self._host + "/ws"
-                ws = websocket.WebSocketApp(
-                    ws_url, on_message=self.on_message, on_error=self.on_error,
-                    on_close=self.on_close, on_open=self.on_open)
-                ws.run_forever(reconnect=_RECONNECT_SECONDS)
+                async with self._session.ws_connect(self._ws_url, heartbeat=30) as ws:
+                    _LOGGER.debug("WS started")
+                    delay = _RECONNECT_SECONDS
+                    async for msg in ws:
+                        #only data frames are parsed, control frames never reach the json decoder
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            message = msg.data
+                        elif msg.type == aiohttp.WSMsgType.BINARY:
+                            message = msg.data
+                        elif msg.type == aiohttp.WSMsgType.ERROR:
+                            _LOGGER.debug(f"Websocket error: {ws.exception()}")
+                            break
+                        else:
+                            continue
+                        try:
+                            if isinstance(message, bytes):
+                                message = message.decode()
+                            self.on_message(message)
+                        except Exception as e:
+                            _LOGGER.debug("Websocket message could not be handled")
+                            _LOGGER.debug(e)
+                _LOGGER.warning(
+                    f"Websocket connection lost to url={self._ws_url} "
+                    f"(close_code={ws.close_code}), "
+                    f"trying to reconnect in {delay} seconds")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                _LOGGER.debug(f"Websocket connection to url={self._ws_url} failed: {e}")
             except Exception as e:
                 _LOGGER.exception(e)
+                _LOGGER.error(f"open_epaper_link websocket task crashed, reconnecting in {delay} seconds")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, _MAX_RECONNECT_SECONDS)
 
-            _LOGGER.error(f"open_epaper_link WebSocketApp crashed, reconnecting in {_RECONNECT_SECONDS} seconds")
-            time.sleep(_RECONNECT_SECONDS)
+    #stops the websocket task, called on unload
+    async def async_stop(self) -> None:
+        self._ws_task.cancel()
+        if self._reload_handle is not None:
+            self._reload_handle.cancel()
 
     #we should do more here
     async def test_connection(self) -> bool:
         return True
+    #runs the delayed reload scheduled for new tags
+    def _reload(self) -> None:
+        self._reload_handle = None
+        self._hass.async_create_task(self.reloadcfgett())
     #reload is reqired to add new entities
     async def reloadcfgett(self) -> bool:
         await self._hass.config_entries.async_unload_platforms(self._cfgenty, ["sensor","camera"])
@@ -11,7 +11,7 @@ import shutil
 import asyncio
 import time
 import base64
-from .const import DOMAIN
+from .const import EVENT_TAG
 from .util import get_image_folder, get_image_path
 from PIL import Image, ImageDraw, ImageFont
 from requests_toolbelt.multipart.encoder import MultipartEncoder
@@ -34,7 +34,7 @@ running = False;
 # setup
 def setup(hass,notsetup):
     if notsetup:
-        hass.bus.listen(DOMAIN + "_event", handle_event)
+        hass.bus.listen(EVENT_TAG, handle_event)
         notsetup = False
     return True
 # handle_event
@@ -90,19 +90,20 @@ def get_wrapped_text(text: str, font: ImageFont.ImageFont,line_length: int):
             else:
                 lines.append(word)
         return '\n'.join(lines)
+# color names (and their short forms) mapped to the palette, anything else is white
+colormap = {
+    "black": black,
+    "b": black,
+    "red": red,
+    "r": red,
+    "yellow": yellow,
+    "y": yellow,
+}
 # converts a color name to the corresponding color index for the palette
 def getIndexColor(color):
     if color is None:
         return None
-    color_str = str(color)
-    if color_str == "black" or color_str == "b":
-        return black
-    elif color_str == "red" or color_str == "r":
-        return red
-    elif color_str == "yellow" or color_str == "y":
-        return yellow
-    else:
-        return white
+    return colormap.get(str(color), white)
 # should_show_element
 def should_show_element(element):
     return element['visible'] if 'visible' in element else True
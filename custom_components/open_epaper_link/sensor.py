@@ -1,5 +1,5 @@
 from __future__ import annotations
-from .const import DOMAIN
+from .const import DOMAIN, WAKEUP_REASONS
 import logging
 import datetime
 _LOGGER: Final = logging.getLogger(__name__)
@@ -14,6 +14,16 @@ from homeassistant.core import HomeAssistant
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
 
+#names for the AP status codes reported in the sys messages
+_AP_STATES = {0: "offline",1: "online",2: "flashing",3: "wait for reset",4: "requires power cycle",5: "failed",6: "coming online"}
+_AP_RUN_STATES = {0: "stopped",1: "pause",2: "running",3: "init"}
+_AP_WIFI_STATES = {3: "connected"}
+
+#device info template for the AP sensors, each returns its own copy and IPSensor adds the full description on top
+_AP_DEVICE_INFO = {
+    "identifiers": {(DOMAIN, "ap")}
+}
+
 async def async_setup_entry(hass, config_entry, async_add_entities):
     hub = hass.data[DOMAIN][config_entry.entry_id]
     new_devices = []
@@ -50,8 +60,7 @@ class IPSensor(SensorEntity):
         self._hub = hub
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")},
+        return _AP_DEVICE_INFO | {
             "configuration_url": "http://" + self._hub.data["ap"]["ip"],
             "name": "OpenEpaperLink AP",
             "model": "esp32",
@@ -71,9 +80,7 @@ class APWifiRssiSensor(SensorEntity):
         self._attr_state_class = SensorStateClass.MEASUREMENT
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = self._hub.data["ap"]["rssi"]
         
@@ -84,12 +91,9 @@ class APStateSensor(SensorEntity):
         self._hub = hub
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
-        lut = {0: "offline",1: "online",2: "flashing",3: "wait for reset",4: "requires power cycle",5: "failed",6: "coming online"}
-        self._attr_native_value = lut[self._hub.data["ap"]["apstate"]]
+        self._attr_native_value = _AP_STATES[self._hub.data["ap"]["apstate"]]
         
 class APRunStateSensor(SensorEntity):
     def __init__(self, hub):
@@ -98,12 +102,9 @@ class APRunStateSensor(SensorEntity):
         self._hub = hub
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
-        lut = {0: "stopped",1: "pause",2: "running",3: "init"}
-        self._attr_native_value = lut[self._hub.data["ap"]["runstate"]]
+        self._attr_native_value = _AP_RUN_STATES[self._hub.data["ap"]["runstate"]]
         
 class APTempSensor(SensorEntity):
     def __init__(self, hub):
@@ -115,9 +116,7 @@ class APTempSensor(SensorEntity):
         self._attr_state_class = SensorStateClass.MEASUREMENT
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         temp = self._hub.data["ap"]["temp"]
         if temp:
@@ -130,12 +129,9 @@ class APWifiStatusSensor(SensorEntity):
         self._hub = hub
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
-        lut = {3: "connected"}
-        self._attr_native_value = lut[self._hub.data["ap"]["wifistatus"]]
+        self._attr_native_value = _AP_WIFI_STATES[self._hub.data["ap"]["wifistatus"]]
         
 class APWifiSssidSensor(SensorEntity):
     def __init__(self, hub):
@@ -144,9 +140,7 @@ class APWifiSssidSensor(SensorEntity):
         self._hub = hub
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = self._hub.data["ap"]["wifissid"]
         
@@ -158,9 +152,7 @@ class SystimeSensor(SensorEntity):
         self._attr_device_class = SensorDeviceClass.TIMESTAMP
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = datetime.datetime.fromtimestamp(self._hub.data["ap"]["systime"], datetime.timezone.utc)
         
@@ -174,9 +166,7 @@ class HeapSensor(SensorEntity):
         self._attr_state_class = SensorStateClass.MEASUREMENT
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = round(int(self._hub.data["ap"]["heap"]) / 1024,1)
 
@@ -187,9 +177,7 @@ class RecordcountSensor(SensorEntity):
         self._hub = hub
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = self._hub.data["ap"]["recordcount"]
         
@@ -203,9 +191,7 @@ class DBsizeSensor(SensorEntity):
         self._attr_state_class = SensorStateClass.MEASUREMENT
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = round(int(self._hub.data["ap"]["dbsize"]) / 1024,1)
         
@@ -219,9 +205,7 @@ class LitefsfreeSensor(SensorEntity):
         self._attr_state_class = SensorStateClass.MEASUREMENT
     @property
     def device_info(self) -> DeviceInfo:
-        return {
-            "identifiers": {(DOMAIN, "ap")}
-        }
+        return dict(_AP_DEVICE_INFO)
     def update(self) -> None:
         self._attr_native_value = round(int(self._hub.data["ap"]["littlefsfree"]) / 1024,1)
 
@@ -397,8 +381,7 @@ class WakeupReasonSensor(SensorEntity):
         }
     def update(self) -> None:
         eslid = self._eslid
-        lut = {0: "TIMED",1: "BOOT",2: "GPIO",3: "NFC",4: "BUTTON1",5: "BUTTON2",252: "FIRSTBOOT",253: "NETWORK_SCAN",254: "WDT_RESET"}
-        wr = lut[self._hub.data[eslid]["wakeupReason"]]
+        wr = WAKEUP_REASONS.get(self._hub.data[eslid]["wakeupReason"], "UNKNOWN")
         self._attr_native_value = wr
         
 class CapabilitiesSensor(SensorEntity):